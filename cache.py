@@ -0,0 +1,39 @@
+import os
+import json
+import time
+import hashlib
+
+CACHE_DIR = ".cache"
+
+# --- JSON ファイルキャッシュ (TTL付き) ---
+class FileCache:
+    def __init__(self, ttl_hours, cache_dir=CACHE_DIR):
+        self.ttl = ttl_hours * 3600
+        self.cache_dir = cache_dir
+
+    def _path(self, key):
+        digest = hashlib.md5(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # 期限切れは未ヒット扱い
+        if time.time() - entry.get('saved_at', 0) > self.ttl:
+            return None
+        return entry.get('value')
+
+    def set(self, key, value):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {'saved_at': time.time(), 'value': value}
+        # 書き込み途中のファイルを読まないよう一時ファイル経由で置き換える
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
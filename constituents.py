@@ -0,0 +1,106 @@
+import os
+import sys
+import asyncio
+import aiohttp
+import lxml.html
+import pandas as pd
+from cache import FileCache
+from http_client import HEADERS, http_get
+
+# JPX400 の構成銘柄は年1回程度しか変わらないので、日次処理では CSV を読むだけにする
+CONSTITUENTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "jpx400.csv")
+# CSV がまだ無い環境では、SBI から取得した結果を7日間キャッシュする
+TARGET_LIST_TTL_HOURS = 24 * 7
+TARGET_LIST_CACHE_KEY = "jpx400:constituents"
+SBI_URL = "https://site1.sbisec.co.jp/ETGate/WPLETmgR001Control?OutSide=on&getFlg=on&burl=search_market&cat1=market&cat2=info&dir=info&file=market_meigara_400.html"
+
+# --- 構成銘柄 CSV ---
+def load_target_list(path=CONSTITUENTS_PATH):
+    try:
+        df = pd.read_csv(path, dtype={'code': 'string', 'name': 'string'})
+    except (OSError, pd.errors.EmptyDataError, pd.errors.ParserError):
+        return None
+
+    # 列名が違う CSV は無いものとして扱い、SBI からの取得に回す
+    if df.empty or not {'code', 'name'} <= set(df.columns):
+        return None
+    return list(zip(df['code'], df['name']))
+
+def save_target_list(target_list, path=CONSTITUENTS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pd.DataFrame(target_list, columns=['code', 'name']).to_csv(path, index=False)
+
+# --- SBI からの取得 ---
+async def fetch_target_list(session):
+    print("Fetching index data from SBI Source...")
+    
+    try:
+        body = await http_get(session, SBI_URL)
+        
+        # ページ内の全テーブルを DataFrame 化せず、対象テーブルだけを lxml で拾う
+        # 不正なバイトは置換して読む (libxml2 に cp932 のまま渡すと、そこで解析が打ち切られる)
+        # str を渡すと XML 宣言付きのページで ValueError になるため、UTF-8 の bytes にして渡す
+        html = body.decode("cp932", errors="replace").encode("utf-8")
+        tree = lxml.html.fromstring(html, parser=lxml.html.HTMLParser(encoding="utf-8"))
+        tables = tree.xpath('//table[contains(concat(" ", normalize-space(@class), " "), " md-l-table-01 ")]')
+        
+        if not tables:
+            print("Error: Table not found.")
+            sys.exit(1)
+            
+        target_table = tables[0]
+        columns = [cell.text_content().strip() for cell in target_table.xpath('(.//tr)[1]/*')]
+        
+        if '銘柄コード' in columns and '銘柄名' in columns:
+            code_idx = columns.index('銘柄コード')
+            name_idx = columns.index('銘柄名')
+            
+            clean_list = []
+            for row in target_table.xpath('.//tr[td]'):
+                cells = row.xpath('./td')
+                if len(cells) <= max(code_idx, name_idx):
+                    continue
+                c = cells[code_idx].text_content().strip()
+                n = cells[name_idx].text_content().strip()
+                if c.isdigit() and len(c) == 4:
+                    clean_list.append((c, n))
+            
+            return clean_list
+        else:
+            print("Error: Columns mismatch.")
+            sys.exit(1)
+
+    except Exception as e:
+        print(f"Error fetching list: {e}")
+        sys.exit(1)
+
+async def get_target_list(session):
+    target_list = load_target_list()
+    if target_list is not None:
+        return target_list
+
+    list_cache = FileCache(ttl_hours=TARGET_LIST_TTL_HOURS)
+    cached = list_cache.get(TARGET_LIST_CACHE_KEY)
+    if cached:
+        print("Index data loaded from cache.")
+        return [tuple(item) for item in cached]
+
+    target_list = await fetch_target_list(session)
+    list_cache.set(TARGET_LIST_CACHE_KEY, target_list)
+    return target_list
+
+# --- Main (CSV 更新) ---
+async def main():
+    timeout = aiohttp.ClientTimeout(total=20)
+    async with aiohttp.ClientSession(timeout=timeout, headers=HEADERS) as session:
+        target_list = await fetch_target_list(session)
+
+    if not target_list:
+        print("No constituents found.")
+        sys.exit(1)
+
+    save_target_list(target_list)
+    print(f"Saved {len(target_list)} stocks to {CONSTITUENTS_PATH}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
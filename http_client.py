@@ -0,0 +1,45 @@
+import asyncio
+import datetime
+import aiohttp
+from email.utils import parsedate_to_datetime
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+}
+
+RETRY_TOTAL = 5
+RETRY_BACKOFF = 0.5
+RETRY_AFTER_MAX = 60
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def retry_delay(attempt, retry_after=None):
+    # サーバーが Retry-After を返した場合はその秒数 (または日時) まで待つ (上限あり)
+    if retry_after:
+        try:
+            return min(RETRY_AFTER_MAX, max(0.0, float(retry_after)))
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(retry_after)
+                wait = (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+                return min(RETRY_AFTER_MAX, max(0.0, wait))
+            except (TypeError, ValueError):
+                pass
+    return RETRY_BACKOFF * (2 ** attempt)
+
+async def http_get(session, url, params=None):
+    # 429/5xx と接続エラーは指数バックオフで再試行 (接続はセッション内で使い回す)
+    for attempt in range(RETRY_TOTAL + 1):
+        last = attempt == RETRY_TOTAL
+        retry_after = None
+        try:
+            async with session.get(url, params=params) as res:
+                if res.status not in RETRY_STATUSES or last:
+                    res.raise_for_status()
+                    return await res.read()
+                retry_after = res.headers.get('Retry-After')
+        except aiohttp.ClientResponseError:
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if last:
+                raise
+        await asyncio.sleep(retry_delay(attempt, retry_after))
@@ -1,194 +1,250 @@
 import os
 import sys
 import datetime
-import pytz
-import requests
+from zoneinfo import ZoneInfo
+import numpy as np
 import pandas as pd
-import yfinance as yf
 import json
-import concurrent.futures
+import orjson
+import gzip
+import io
+import html
+import asyncio
+import aiohttp
 import jpholiday
-import time
-import random
-import math  # 追加: 平方根計算用
-from io import StringIO
-import logging
+from functools import lru_cache
+from cache import FileCache, CACHE_DIR
+from http_client import HEADERS, http_get
+from constituents import get_target_list
 
 # --- 設定 ---
 try:
     config_json = os.environ["SYNC_CONFIG"]
-    config = json.loads(config_json)
+    config = orjson.loads(config_json)
     
     API_ENDPOINT = config["endpoint"]
     API_USER = config["user"]
     API_TOKEN = config["token"]
     TARGET_ID = config["resource_id"]
+    # 同期先が gzip の本文を展開できる場合だけ "gzip": true で有効にする
+    API_GZIP = bool(config.get("gzip", False))
 
 except KeyError:
     print("Configuration not found.")
     sys.exit(1)
-except json.JSONDecodeError:
+except orjson.JSONDecodeError:
     print("Invalid configuration format.")
     sys.exit(1)
 
-# --- ログ抑制 ---
-logger = logging.getLogger('yfinance')
-logger.setLevel(logging.CRITICAL)
+# --- タイムゾーン ---
+JST = ZoneInfo('Asia/Tokyo')
+
+# --- 取得元 ---
+COOKIE_URL = "https://fc.yahoo.com"
+CRUMB_URL = "https://query1.finance.yahoo.com/v1/test/getcrumb"
+QUOTE_URL = "https://query1.finance.yahoo.com/v7/finance/quote"
+QUOTE_BATCH_SIZE = 20
+
+# --- 接続プール ---
+POOL_LIMIT = 32
+POOL_LIMIT_PER_HOST = 20
+KEEPALIVE_TIMEOUT = 60
+
+# --- キャッシュ ---
+# 財務データは四半期ごとにしか変わらない
+# 実行は平日1日1回なので、週末 (72時間) + 祝日1日をまたいでも次回実行で使えるようにする
+FUNDAMENTALS_TTL_HOURS = 96
+SKIPLIST_PATH = os.path.join(CACHE_DIR, "no_fundamentals.json")
+SKIPLIST_TTL_DAYS = 30
+FUNDAMENTAL_FIELDS = ('epsForward', 'epsTrailingTwelveMonths', 'trailingPE', 'bookValue', 'priceToBook')
+# PER/PBR は株価に依存するので、株価と無関係な項目だけをキャッシュする
+CACHED_FUNDAMENTAL_FIELDS = ('epsForward', 'epsTrailingTwelveMonths', 'bookValue')
+
+# quote API には使う項目だけを要求し、1銘柄あたり数十項目あるレスポンスを小さくする
+QUOTE_FIELDS = ",".join(('regularMarketPrice', *FUNDAMENTAL_FIELDS))
 
 # --- 1. カレンダーチェック ---
+@lru_cache(maxsize=1)
+def _today():
+    # 実行日 (JST)。1回の実行中は同じ日付を使い回す
+    return datetime.datetime.now(JST).date()
+
+@lru_cache(maxsize=4096)
+def _is_jp_holiday(d):
+    return jpholiday.is_holiday(d)
+
 def check_calendar():
-    jst_tz = pytz.timezone('Asia/Tokyo')
-    today = datetime.datetime.now(jst_tz).date()
+    today = _today()
 
     if today.weekday() >= 5:
         print("Weekend. Skipping.")
         sys.exit(0)
 
-    if jpholiday.is_holiday(today):
+    if _is_jp_holiday(today):
         print(f"Holiday ({jpholiday.holiday_name(today)}). Skipping.")
         sys.exit(0)
 
     print(f"Market Open: {today}")
 
-# --- 個別銘柄処理 (グレアム数版) ---
-def analyze_stock(args):
-    code, jp_name = args
-    ticker_symbol = f"{code}.T"
-    
-    time.sleep(0.05) # 高速モード
-
-    info = None
-    for i in range(2):
-        try:
-            stock = yf.Ticker(ticker_symbol)
-            info = stock.info
-            if info and 'currentPrice' in info:
-                break
-        except Exception:
-            time.sleep(0.5)
-            pass
-    
-    if info is None:
-        return {'status': 'error', 'code': code, 'reason': 'Fetch Failed'}
+# --- 全銘柄一括処理 (グレアム数版) ---
+def analyze_universe(df):
+    price = df['val']
 
-    try:
-        price = info.get('currentPrice')
-        if price is None:
-            return {'status': 'error', 'code': code, 'reason': 'No Price'}
-
-        # --- 1. EPS (1株当たり利益) の取得 ---
-        # 予想EPSを優先、なければ実績EPS
-        eps = info.get('forwardEps')
-        if eps is None:
-            eps = info.get('trailingEps')
-        
-        # それでもなければPERから逆算
-        if eps is None:
-            pe = info.get('trailingPE')
-            if pe and pe > 0:
-                eps = price / pe
-
-        # EPSがない、または赤字の場合は計算不能 (グレアム数はルート計算するため正の数必須)
-        if eps is None or eps <= 0:
-            return {'status': 'error', 'code': code, 'reason': 'Red Ink (EPS <= 0)'}
-
-        # --- 2. BPS (1株当たり純資産) の取得 ---
-        bps = info.get('bookValue')
-        
-        # BPSがない場合、PBRから逆算 (BPS = 株価 / PBR)
-        if bps is None:
-            pbr = info.get('priceToBook')
-            if pbr and pbr > 0:
-                bps = price / pbr
-        
-        # 債務超過(BPSマイナス)の場合は計算不能
-        if bps is None or bps <= 0:
-            return {'status': 'error', 'code': code, 'reason': 'Deficit (BPS <= 0)'}
-
-        # --- 3. グレアム数 (理論株価) の計算 ---
-        # 公式: √ (22.5 * EPS * BPS)
-        # 意味: PER 15倍 × PBR 1.5倍 = 22.5 を基準とした理論値
-        try:
-            graham_number = math.sqrt(22.5 * eps * bps)
-        except ValueError:
-            return {'status': 'error', 'code': code, 'reason': 'Math Domain Error'}
-
-        fair_value = graham_number
-        
-        # 割安度 (%)
-        upside = ((fair_value - price) / price) * 100
-        
-        # それでも異常値(例えば+500%など)が出る場合は、データミスの可能性が高いので弾く
-        # ※グレアム数で+300%以上はよほどの資産バリュー株でない限り稀
-        if upside > 300: 
-             return {'status': 'error', 'code': code, 'reason': f'Too High (>300%): {upside:.0f}%'}
-
-        return {
-            'status': 'success',
-            'id': code,
-            'label': jp_name,
-            'val': price,
-            'target': fair_value,
-            'diff': upside,
-            'eps': eps,  # 参考データ
-            'bps': bps   # 参考データ
-        }
-        
-    except Exception as e:
-        return {'status': 'error', 'code': code, 'reason': str(e)}
+    # --- 1. EPS (1株当たり利益) の取得 ---
+    # 予想EPSを優先、なければ実績EPS、それでもなければPERから逆算
+    pe = df['trailingPE']
+    eps = df['epsForward'].fillna(df['epsTrailingTwelveMonths'])
+    eps = eps.fillna((price / pe).where(pe > 0))
 
-# --- 2. データ取得 ---
-def fetch_target_list():
-    print("Fetching index data from SBI Source...")
-    url = "https://site1.sbisec.co.jp/ETGate/WPLETmgR001Control?OutSide=on&getFlg=on&burl=search_market&cat1=market&cat2=info&dir=info&file=market_meigara_400.html"
-    
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    }
+    # --- 2. BPS (1株当たり純資産) の取得 ---
+    # BPSがない場合、PBRから逆算 (BPS = 株価 / PBR)
+    pbr = df['priceToBook']
+    bps = df['bookValue'].fillna((price / pbr).where(pbr > 0))
+
+    # EPS/BPSがない、または赤字・債務超過の場合は計算不能 (グレアム数はルート計算するため正の数必須)
+    valid_eps = eps > 0
+    valid_bps = bps > 0
+
+    # --- 3. グレアム数 (理論株価) の計算 ---
+    # 公式: √ (22.5 * EPS * BPS)
+    # 意味: PER 15倍 × PBR 1.5倍 = 22.5 を基準とした理論値
+    fair_value = np.sqrt(22.5 * eps.where(valid_eps) * bps.where(valid_bps))
+
+    # 割安度 (%)
+    upside = ((fair_value - price) / price) * 100
 
+    # それでも異常値(例えば+500%など)が出る場合は、データミスの可能性が高いので弾く
+    # ※グレアム数で+300%以上はよほどの資産バリュー株でない限り稀
+    too_high = upside > 300
+
+    # 除外理由は先に該当した条件を採用する
+    reason = pd.Series(
+        np.select(
+            [~df['fetched'], price.isna(), ~valid_eps, ~valid_bps, too_high],
+            ['Fetch Failed', 'No Price', 'Red Ink (EPS <= 0)', 'Deficit (BPS <= 0)', 'Too High (>300%): '],
+            default=''
+        ),
+        index=df.index
+    )
+    reason[reason == 'Too High (>300%): '] += upside[reason == 'Too High (>300%): '].map('{:.0f}%'.format)
+
+    ok = reason == ''
+    results = pd.DataFrame({
+        'id': df['id'],
+        'label': df['label'],
+        'val': price,
+        'target': fair_value,
+        'diff': upside,
+        'eps': eps,  # 参考データ
+        'bps': bps   # 参考データ
+    })[ok].sort_values('diff', ascending=False)
+    errors = pd.DataFrame({'code': df['id'], 'reason': reason, 'eps': eps, 'bps': bps})[~ok]
+
+    return results, errors
+
+# --- 株価・財務データの一括取得 ---
+async def fetch_crumb(session):
+    # Cookie を取得してから crumb を発行してもらう
     try:
-        res = requests.get(url, headers=headers, timeout=20)
-        res.encoding = "cp932"
-        
-        dfs = pd.read_html(StringIO(res.text), attrs={"class": "md-l-table-01"}, header=0)
-        
-        if not dfs:
-            print("Error: Table not found.")
-            sys.exit(1)
-            
-        target_df = dfs[0]
-        
-        if '銘柄コード' in target_df.columns and '銘柄名' in target_df.columns:
-            codes = target_df['銘柄コード'].astype(str).str.strip().tolist()
-            names = target_df['銘柄名'].astype(str).str.strip().tolist()
-            
-            clean_list = []
-            for c, n in zip(codes, names):
-                if c.isdigit() and len(c) == 4:
-                    clean_list.append((c, n))
-            
-            return clean_list
-        else:
-            print("Error: Columns mismatch.")
+        async with session.get(COOKIE_URL):
+            pass
+        crumb = (await http_get(session, CRUMB_URL)).decode().strip()
+        if not crumb:
+            print("Error fetching crumb: empty response")
             sys.exit(1)
-
+        return crumb
     except Exception as e:
-        print(f"Error fetching list: {e}")
+        print(f"Error fetching crumb: {e}")
         sys.exit(1)
 
-# --- 3. レポート生成 ---
-def build_payload(data):
-    today = datetime.datetime.now(pytz.timezone('Asia/Tokyo')).strftime('%Y/%m/%d')
+async def fetch_quote_chunk(session, crumb, chunk):
+    symbols = ",".join(f"{c}.T" for c in chunk)
+    try:
+        body = await http_get(session, QUOTE_URL, params={'symbols': symbols, 'fields': QUOTE_FIELDS, 'crumb': crumb})
+        return orjson.loads(body)['quoteResponse']['result']
+    except Exception:
+        return []
+
+async def fetch_quotes_batch(session, crumb, codes, cache):
+    # quote API は1リクエストで最大20銘柄まで
+    chunks = [codes[i:i + QUOTE_BATCH_SIZE] for i in range(0, len(codes), QUOTE_BATCH_SIZE)]
+
+    # 全チャンクの完了を待たず、届いた順に財務データの整理 (キャッシュ読み書き) を進める
+    quotes = {}
+    for task in asyncio.as_completed([fetch_quote_chunk(session, crumb, chunk) for chunk in chunks]):
+        for quote in await task:
+            code = quote['symbol'].split('.')[0]
+            quotes[code] = {**get_fundamentals(cache, code, quote), 'val': get_price(quote)}
+
+    return quotes
+
+def get_fundamentals(cache, code, quote):
+    key = f"{code}:fundamentals"
+    fresh = {k: quote[k] for k in FUNDAMENTAL_FIELDS if quote.get(k) is not None}
+
+    # 今回の quote に財務データがあれば、それだけを使って保存し直す (古い値は引き継がない)
+    cacheable = {k: fresh[k] for k in CACHED_FUNDAMENTAL_FIELDS if k in fresh}
+    if cacheable:
+        cache.set(key, cacheable)
+        return fresh
+
+    # 財務データが丸ごと欠けている場合だけ、期限内のキャッシュで補う
+    return {**(cache.get(key) or {}), **fresh}
+
+def get_price(quote):
+    # 株価は毎回 quote の値を使う (キャッシュしない)
+    return quote.get('regularMarketPrice')
+
+def build_frame(target_list, quotes):
+    rows = []
+    for code, jp_name in target_list:
+        quote = quotes.get(code)
+        row = {'id': code, 'label': jp_name, 'fetched': quote is not None}
+        if quote is not None:
+            row.update(quote)
+        rows.append(row)
+
+    df = pd.DataFrame(rows, columns=['id', 'label', 'fetched', 'val', *FUNDAMENTAL_FIELDS])
+    numeric_cols = ['val', *FUNDAMENTAL_FIELDS]
+    df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors='coerce')
+    # 銘柄が0件でも np.select の条件が bool 配列になるよう型を固定する
+    df['fetched'] = df['fetched'].astype(bool)
+    return df
 
-    html = f"""
-    <h3>JPX400 適正株価 ({today})</h3>
+# --- 赤字/債務超過銘柄のスキップリスト ---
+def load_skiplist():
+    try:
+        with open(SKIPLIST_PATH, encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    # 30日を過ぎたものは黒字化している可能性があるので再取得する
+    today = _today()
+    return {
+        code: d for code, d in entries.items()
+        if (today - datetime.date.fromisoformat(d)).days < SKIPLIST_TTL_DAYS
+    }
+
+def save_skiplist(skiplist, error_log):
+    today = _today().isoformat()
+    # 値が取れなかっただけ (NaN) の銘柄は一時的な欠損かもしれないので記録しない
+    known_bad = (error_log['eps'] <= 0) | (error_log['bps'] <= 0)
+    for err in error_log[known_bad].itertuples():
+        skiplist.setdefault(err.code, today)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(SKIPLIST_PATH, "w", encoding="utf-8") as f:
+        json.dump(skiplist, f)
+
+# --- 3. レポート生成 ---
+REPORT_INTRO = """
     <p>ベンジャミン・グレアムのミックス係数に基づき算出しています。<br>
     <blockquote>適正株価 = √(22.5 × EPS × BPS)</blockquote>
     ※PER 15倍 × PBR 1.5倍 = 22.5 を基準とした理論値です。<br>資産と利益の両面から見た保守的な適正価格です。</p>
     """
-    
-    html += '<table style="font-size: 10px; line-height: 1.1; border-collapse: collapse; width: 100%; text-align: left;">'
-    html += """
+
+REPORT_TABLE_HEAD = '<table style="font-size: 10px; line-height: 1.1; border-collapse: collapse; width: 100%; text-align: left;">' + """
     <thead style="background-color: #f4f4f4;">
         <tr>
             <th style="padding: 2px 4px;">コード</th>
@@ -200,105 +256,191 @@ def build_payload(data):
     </thead>
     <tbody>
     """
-    
-    for item in data:
-        diff_val = item['diff']
-        diff_str = f"{diff_val:+.0f}%"
-        
-        # 割安(プラス)は赤、割高(マイナス)は青
-        color = "#d32f2f" if diff_val > 0 else "#1976d2"
-        # 乖離が0に近い場合(適正圏内)は黒にする
-        if -10 < diff_val < 10:
-            color = "#333"
-
-        diff_html = f'<span style="color: {color}; font-weight: bold;">{diff_str}</span>'
-            
-        row = f"""
-        <tr style="border-bottom: 1px solid #eee;">
-            <td style="padding: 2px 4px;"><strong>{item['id']}</strong></td>
-            <td style="padding: 2px 4px;">{item['label']}</td>
-            <td style="padding: 2px 4px;">{item['val']:,.0f}</td>
-            <td style="padding: 2px 4px;">{item['target']:,.0f}</td>
-            <td style="padding: 2px 4px;">{diff_html}</td>
-        </tr>
-        """
-        html += row
 
-    html += "</tbody></table>"
-    html += f"<br><small style='font-size:9px; color:#777;'>本情報は、投資勧誘を目的としたものではありません。投資判断は自己責任で行ってください。<br>分析対象: {len(data)}銘柄 (除外: 赤字/債務超過/データ欠損)</small>"
-    
-    return html
+ROW_OPEN = '<tr style="border-bottom: 1px solid #eee;">'
+CELL_OPEN = '<td style="padding: 2px 4px;">'
+CELL_CLOSE = '</td>'
+# 表は ROW_BLOCK_SIZE 行ずつの断片にして返す
+ROW_BLOCK_SIZE = 50
+COLOR_UNDERVALUED = "#d32f2f"
+COLOR_OVERVALUED = "#1976d2"
+COLOR_NEUTRAL = "#333"
+
+def shorten_price(values):
+    # 1,000円以上は "1.2k" 表記にして文字数を減らす ("2.0k" のような末尾の .0 は付けない)
+    # 999.5 が "1000" にならないよう、円単位に丸めた値で表記を切り替える
+    yen = values.round(0)
+    return np.where(
+        yen >= 1000,
+        (yen / 1000).round(1).astype(str).str.removesuffix('.0') + 'k',
+        yen.astype(np.int64).astype(str)
+    )
+
+def quantize_report(df):
+    # 割安度の ±数% はモデル誤差の範囲なので整数に丸める (上限 +300% なので int16 で足りる)
+    # 送信量を減らすため、表示用の文字列はここでまとめて作っておく
+    # 現在株価と適正株価は見比べるものなので、同じ表記にそろえる
+    df = df.copy()
+    df['val_fmt'] = shorten_price(df['val'])
+    df['target_fmt'] = shorten_price(df['target'])
+    df['diff'] = df['diff'].round().astype(np.int16)
+    return df
+
+def render_table_rows(df):
+    # 乖離が0に近い場合(適正圏内)は黒、割安(プラス)は赤、割高(マイナス)は青
+    color = pd.Series(np.select(
+        [(df['diff'] > -10) & (df['diff'] < 10), df['diff'] > 0],
+        [COLOR_NEUTRAL, COLOR_UNDERVALUED],
+        default=COLOR_OVERVALUED
+    ), index=df.index)
+
+    # 行の HTML は列単位の文字列演算でまとめて組み立てる (社名はエスケープしてタグの混入を防ぐ)
+    rows = (
+        ROW_OPEN
+        + CELL_OPEN + '<strong>' + df['id'] + '</strong>' + CELL_CLOSE
+        + CELL_OPEN + df['label'].map(html.escape) + CELL_CLOSE
+        + CELL_OPEN + df['val_fmt'] + CELL_CLOSE
+        + CELL_OPEN + df['target_fmt'] + CELL_CLOSE
+        + CELL_OPEN + '<span style="color: ' + color + '; font-weight: bold;">' + df['diff'].map('{:+d}%'.format) + '</span>' + CELL_CLOSE
+        + '</tr>'
+    )
+
+    for start in range(0, len(rows), ROW_BLOCK_SIZE):
+        yield "".join(rows.iloc[start:start + ROW_BLOCK_SIZE])
+
+def build_payload(df):
+    today = _today().strftime('%Y/%m/%d')
+
+    # 1つの大きな文字列は作らず、断片を順に返す (送信時に直接 JSON へ書き出す)
+    yield f"""
+    <h3>JPX400 適正株価 ({today})</h3>"""
+    yield REPORT_INTRO
+    yield REPORT_TABLE_HEAD
+    yield from render_table_rows(df)
+    yield "</tbody></table>"
+    yield f"<br><small style='font-size:9px; color:#777;'>本情報は、投資勧誘を目的としたものではありません。投資判断は自己責任で行ってください。<br>分析対象: {len(df)}銘柄 (除外: 赤字/債務超過/データ欠損)</small>"
 
 # --- 4. リモート同期 ---
-def sync_remote_node(content_body):
+def remote_node_url():
+    return f"{API_ENDPOINT}/wp-json/wp/v2/pages/{TARGET_ID}"
+
+async def warm_up_remote_node(session):
+    # 接続をプールに残すことだけが目的なので、応答内容や失敗は気にしない
+    try:
+        async with session.head(remote_node_url()):
+            pass
+    except Exception:
+        pass
+
+async def post_payload(session, target_url, body, headers):
+    async with session.post(
+        target_url, 
+        data=body, 
+        auth=aiohttp.BasicAuth(API_USER, API_TOKEN),
+        headers=headers
+    ) as res:
+        return res.status
+
+def encode_payload(content_chunks):
+    # {"content": "..."} を組み立てる。各断片は JSON 文字列としてエスケープし、両端の引用符を外して連結する
+    buf = io.BytesIO()
+    buf.write(b'{"content":"')
+    for chunk in content_chunks:
+        buf.write(orjson.dumps(chunk)[1:-1])
+    buf.write(b'"}')
+    return buf.getvalue()
+
+async def sync_remote_node(session, content_chunks):
     print("Syncing with remote node...")
     
-    target_url = f"{API_ENDPOINT}/wp-json/wp/v2/pages/{TARGET_ID}"
+    target_url = remote_node_url()
     
     headers = {
-        "Content-Type": "application/json"
+        "Content-Type": "application/json",
+        "Accept-Encoding": "gzip"
     }
     
-    payload = {
-        'content': content_body
-    }
+    body = encode_payload(content_chunks)
     
     try:
-        res = requests.post(
-            target_url, 
-            json=payload, 
-            auth=(API_USER, API_TOKEN),
-            headers=headers
-        )
-        if res.status_code == 200:
+        if API_GZIP:
+            # HTMLはよく縮むので gzip で送る。415 (非対応) が返った場合だけ非圧縮で送り直す
+            status = await post_payload(session, target_url, gzip.compress(body), {**headers, "Content-Encoding": "gzip"})
+            if status == 415:
+                status = await post_payload(session, target_url, body, headers)
+        else:
+            # Apache/nginx + PHP の標準構成は本文を展開しないので、既定は非圧縮で1回だけ送る
+            status = await post_payload(session, target_url, body, headers)
+        
+        if status == 200:
             print("Sync complete.")
         else:
-            print(f"Sync failed: {res.status_code}")
+            print(f"Sync failed: {status}")
             sys.exit(1)
     except Exception as e:
         print(f"Connection error: {e}")
         sys.exit(1)
 
 # --- Main ---
-if __name__ == "__main__":
+async def main():
     check_calendar()
     
-    target_list = fetch_target_list()
-    print(f"List loaded: {len(target_list)} stocks found.")
-    
-    success_results = []
-    error_log = []
-    
-    print(f"Processing {len(target_list)} stocks (Graham Method)...")
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-        futures = list(executor.map(analyze_stock, target_list))
+    # 全リクエストで1つのセッションを共有し、TLS接続を keep-alive で使い回す
+    connector = aiohttp.TCPConnector(
+        limit=POOL_LIMIT,
+        limit_per_host=POOL_LIMIT_PER_HOST,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=300
+    )
+    timeout = aiohttp.ClientTimeout(total=20)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=HEADERS) as session:
+        # 構成銘柄はリポジトリ内の CSV を使い、無い場合だけ SBI から取得する
+        # SBI から取得する場合も crumb の取得と並行して待つ
+        list_task = asyncio.create_task(get_target_list(session))
+        crumb = await fetch_crumb(session)
+        target_list = await list_task
+        print(f"List loaded: {len(target_list)} stocks found.")
         
-    for res in futures:
-        if res is None: continue
-        if res['status'] == 'success':
-            success_results.append(res)
-        else:
-            error_log.append(res)
+        # 前回までに EPS/BPS が使えなかった銘柄は通信前に除外する
+        skiplist = load_skiplist()
+        listed_count = len(target_list)
+        target_list = [(code, jp_name) for code, jp_name in target_list if code not in skiplist]
+        skipped_count = listed_count - len(target_list)
+        if skipped_count:
+            print(f"Known no-fundamentals: {skipped_count} stocks skipped.")
+        
+        print(f"Processing {len(target_list)} stocks (Graham Method)...")
+        
+        # 株価取得の待ち時間中に、同期先への接続 (DNS/TLS) を先に張っておく
+        warmup_task = asyncio.create_task(warm_up_remote_node(session))
+        
+        fundamentals_cache = FileCache(ttl_hours=FUNDAMENTALS_TTL_HOURS)
+        quotes = await fetch_quotes_batch(session, crumb, [code for code, _ in target_list], fundamentals_cache)
+        universe = build_frame(target_list, quotes)
+        
+        # 割安度順にソート済み
+        sorted_data, error_log = analyze_universe(universe)
+        save_skiplist(skiplist, error_log)
 
-    print("-" * 30)
-    print(f"Analysis Finished.")
-    print(f"Success: {len(success_results)}")
-    print(f"Skipped: {len(error_log)}")
-    
-    # エラー詳細(トップ10)
-    if error_log:
-        print("\n--- Skip Reasons (Top 10) ---")
-        for err in error_log[:10]:
-            print(f"[{err['code']}] {err['reason']}")
-    print("-" * 30)
-
-    if not success_results:
-        print("No valid data found.")
-        sys.exit(0)
+        print("-" * 30)
+        print(f"Analysis Finished.")
+        print(f"Success: {len(sorted_data)}")
+        print(f"Skipped: {len(error_log)}")
+        
+        # エラー詳細(トップ10)
+        if not error_log.empty:
+            print("\n--- Skip Reasons (Top 10) ---")
+            for err in error_log.head(10).itertuples():
+                print(f"[{err.code}] {err.reason}")
+        print("-" * 30)
 
-    # 割安度順にソート
-    sorted_data = sorted(success_results, key=lambda x: x['diff'], reverse=True)
-    
-    report_html = build_payload(sorted_data)
-    sync_remote_node(report_html)
+        if sorted_data.empty:
+            print("No valid data found.")
+            sys.exit(0)
+
+        await warmup_task
+        report_chunks = build_payload(quantize_report(sorted_data))
+        await sync_remote_node(session, report_chunks)
+
+if __name__ == "__main__":
+    asyncio.run(main())